@@ -92,11 +92,11 @@ fi
 
 # Extract events from Microsoft 365
 echo "Extracting events from Microsoft 365..."
-$PYTHON_CMD $EVENT_EXTRACTION_SCRIPT --user $FROM_USER --output ${FROM_USER}_events.json --pretty
+$PYTHON_CMD $EVENT_EXTRACTION_SCRIPT --user $FROM_USER --output ${FROM_USER}_events.ndjson --format ndjson
 
 # Convert JSON to CSV
 echo "Converting events to CSV format..."
-$PYTHON_CMD $JSON2CSV_SCRIPT --input ${FROM_USER}_events.json --output ${FROM_USER}_events.csv
+$PYTHON_CMD $JSON2CSV_SCRIPT --input ${FROM_USER}_events.ndjson --output ${FROM_USER}_events.csv
 
 echo "================================================"
 echo "Creating calendar events in Google Calendar"
@@ -2,104 +2,242 @@
 """
 Process Microsoft 365 Calendar Events JSON and extract meeting URLs to CSV
 Creates a CSV file for each user with event IDs and meeting URLs
+
+Only needs the standard library (orjson and ijson are used when installed),
+so it also runs under PyPy: pypy3 extract_meeting_urls.py --input ...
 """
 
-import json
 import csv
+import gzip
 import argparse
 import os
+import re
+from collections import OrderedDict
 from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    import json
+    _loads = json.loads
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+FIELDNAMES = (
+    "event_id",
+    "event_name",
+    "event_description",
+    "start_date",
+    "end_date",
+    "timezone",
+    "meeting_url",
+    "location",
+    "attendees_emails",
+    "attendees_count"
+)
+
+# Buffer size for CSV output, to cut down on write() syscalls
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Bytes read from the start of an export to tell NDJSON from a JSON document
+_SNIFF_SIZE = 1 << 16
+
+# First key of a JSON object, used when the first line outgrows the sniffed prefix
+_FIRST_KEY_RE = re.compile(rb'\s*\{\s*"([^"\\]*)"')
+
+# Most per-user CSV files kept open at once, well under typical open-file limits
+MAX_OPEN_FILES = 64
+
+# Locations that look like a meeting link
+_URL_RE = re.compile(r"http|zoom\.us|teams\.microsoft\.com", re.IGNORECASE)
 
-def extract_meeting_urls_from_json(json_file, output_dir="."):
-    """Extract meeting URLs from JSON and create CSV files per user"""
+def _open_input(path):
+    """Open an export file in binary mode, decompressing .gz files on the fly"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+def _is_ndjson(f):
+    """Check whether an export is NDJSON, leaving f rewound to the start
+    
+    Only a bounded prefix is read, so a compact single-line JSON document is
+    never loaded just to sniff its layout.
+    """
+    prefix = f.read(_SNIFF_SIZE)
+    f.seek(0)
     
-    print(f"📖 Reading JSON file: {json_file}")
+    newline = prefix.find(b"\n")
+    if newline == -1:
+        # A compact export document starts with export_info or events;
+        # any other object is a single NDJSON event longer than the prefix
+        match = _FIRST_KEY_RE.match(prefix)
+        return match is not None and match.group(1) not in (b"export_info", b"events")
+    try:
+        first = _loads(prefix[:newline])
+    except ValueError:
+        return False
+    return isinstance(first, dict) and "events" not in first
+
+def _iter_events(f):
+    """Yield events one at a time from an export file opened in binary mode
     
-    with open(json_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    Accepts both the NDJSON layout (one event per line, optionally after an
+    export_info header line) and the single JSON document layout.
+    """
+    if _is_ndjson(f):
+        lines = iter(f)
+        first = _loads(next(lines))
+        if "export_info" not in first:
+            yield first
+        
+        for line in lines:
+            if line.strip():
+                yield _loads(line)
+        return
     
-    events = data.get("events", [])
-    print(f"📊 Found {len(events)} events")
+    if ijson is not None:
+        # Stream events so the whole export never has to fit in memory
+        yield from ijson.items(f, "events.item")
+        return
     
-    # Group events by user
-    user_events = {}
+    data = _loads(f.read())
+    yield from data.get("events", [])
+
+def _event_rows(events):
+    """Yield (user_email, row) for each event, with row in FIELDNAMES order"""
     for event in events:
-        user_email = event.get("user_email", "unknown")
-        if user_email not in user_events:
-            user_events[user_email] = []
-        user_events[user_email].append(event)
+        g = event.get
+        
+        # Use the location as meeting URL if it contains a link,
+        # otherwise fall back to the dedicated meeting_url field
+        location = g("location", "")
+        if location and _URL_RE.search(location):
+            meeting_url = location
+        else:
+            meeting_url = g("meeting_url", "")
+        
+        # Extract attendees emails
+        attendees = g("attendees", [])
+        attendees_emails = "; ".join(email for attendee in attendees if (email := attendee.get("email")))
+        
+        yield g("user_email", "unknown"), (
+            g("event_id", ""),
+            g("event_name", ""),
+            g("event_description", ""),
+            g("start_date", ""),
+            g("end_date", ""),
+            g("timezone", ""),
+            meeting_url,
+            location,
+            attendees_emails,
+            len(attendees)
+        )
+
+class _CsvPaths(dict):
+    """CSV path per user email, worked out on the first lookup for that user"""
     
-    print(f"👥 Found events for {len(user_events)} users")
+    def __init__(self, output_dir, verbose=False):
+        super().__init__()
+        self.output_dir = output_dir
+        self.verbose = verbose
     
-    # Process each user
-    for user_email, user_event_list in user_events.items():
+    def __missing__(self, user_email):
         # Extract username from email (part before @)
         username = user_email.split("@")[0]
-        csv_filename = os.path.join(output_dir, f"{username}_events.csv")
+        csv_filename = os.path.join(self.output_dir, f"{username}_events.csv")
+        if self.verbose:
+            print(f"📝 Writing events for {user_email} to {csv_filename}")
+        self[user_email] = csv_filename
+        return csv_filename
+
+class _UserWriters:
+    """CSV writers per user, opened on the first event seen for that user
+    
+    Users whose emails share the part before @ write to the same CSV file.
+    At most MAX_OPEN_FILES files stay open; the least recently used one is
+    closed and reopened in append mode when that user shows up again.
+    """
+    
+    def __init__(self, output_dir, verbose=False):
+        self.filenames = _CsvPaths(output_dir, verbose)  # user email -> CSV path
+        self.created = set()  # CSV paths whose header has been written
+        self.open_files = OrderedDict()  # CSV path -> (file, writer), oldest first
+    
+    def writer(self, user_email):
+        csv_filename = self.filenames[user_email]
         
-        print(f"📝 Processing {len(user_event_list)} events for {user_email}")
+        entry = self.open_files.get(csv_filename)
+        if entry is not None:
+            self.open_files.move_to_end(csv_filename)
+            return entry[1]
         
-        with open(csv_filename, "w", newline="", encoding="utf-8") as csvfile:
-            fieldnames = [
-                "event_id",
-                "event_name", 
-                "event_description",
-                "start_date",
-                "end_date",
-                "timezone",
-                "meeting_url",
-                "location",
-                "attendees_emails",
-                "attendees_count"
-            ]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            
-            for event in user_event_list:
-                # Extract meeting URL from location field
-                location = event.get("location", "")
-                meeting_url = ""
-                
-                # Check if location contains a URL
-                if location and ("http" in location.lower() or "zoom.us" in location.lower() or "teams.microsoft.com" in location.lower()):
-                    meeting_url = location
-                
-                # Also check the dedicated meeting_url field
-                if not meeting_url:
-                    meeting_url = event.get("meeting_url", "")
-                
-                # Extract attendees emails
-                attendees = event.get("attendees", [])
-                attendees_emails = "; ".join([attendee.get("email", "") for attendee in attendees if attendee.get("email")])
-                attendees_count = len(attendees) if attendees else 0
-                
-                # Write row
-                writer.writerow({
-                    "event_id": event.get("event_id", ""),
-                    "event_name": event.get("event_name", ""),
-                    "event_description": event.get("event_description", ""),
-                    "start_date": event.get("start_date", ""),
-                    "end_date": event.get("end_date", ""),
-                    "timezone": event.get("timezone", ""),
-                    "meeting_url": meeting_url,
-                    "location": location,
-                    "attendees_emails": attendees_emails,
-                    "attendees_count": attendees_count
-                })
+        if len(self.open_files) >= MAX_OPEN_FILES:
+            _, (oldest, _) = self.open_files.popitem(last=False)
+            oldest.close()
         
-        print(f"✅ Created {csv_filename}")
+        if csv_filename in self.created:
+            csvfile = open(csv_filename, "a", newline="", encoding="utf-8", buffering=WRITE_BUFFER_SIZE)
+            writer = csv.writer(csvfile)
+        else:
+            csvfile = open(csv_filename, "w", newline="", encoding="utf-8", buffering=WRITE_BUFFER_SIZE)
+            writer = csv.writer(csvfile)
+            writer.writerow(FIELDNAMES)
+            self.created.add(csv_filename)
+        self.open_files[csv_filename] = (csvfile, writer)
+        return writer
+    
+    def close(self):
+        for csvfile, _ in self.open_files.values():
+            csvfile.close()
+        self.open_files.clear()
+
+def extract_meeting_urls_from_json(json_file, output_dir=".", user=None, verbose=False):
+    """Extract meeting URLs from JSON and create CSV files per user
+    
+    If user is given, events belonging to other users are skipped.
+    Per-user progress is only printed when verbose is set.
+    """
+    
+    if verbose:
+        print(f"📖 Reading JSON file: {json_file}")
+    
+    user_writers = _UserWriters(output_dir, verbose=verbose)
+    
+    try:
+        with _open_input(json_file) as f:
+            events = _iter_events(f)
+            if user is not None:
+                events = (event for event in events if event.get("user_email", "unknown") == user)
+            
+            # Exports normally hold one user's events back to back, so each run
+            # of consecutive rows goes to its user's CSV in a single writerows call
+            for user_email, rows in groupby(_event_rows(events), key=itemgetter(0)):
+                user_writers.writer(user_email).writerows(map(itemgetter(1), rows))
+    finally:
+        user_writers.close()
+    
+    if verbose:
+        print(f"👥 Found events for {len(user_writers.filenames)} users")
     
     print(f"\n🎉 Processing complete!")
-    print(f"📁 Created CSV files for {len(user_events)} users in {output_dir}")
+    print(f"📁 Created {len(user_writers.created)} CSV files in {output_dir}")
 
 def main():
     parser = argparse.ArgumentParser(description="Extract meeting URLs from MS events JSON to CSV")
     parser.add_argument("--input", type=str, required=True, 
-                       help="Input JSON file (e.g., theo_events.json)")
+                       help="Input JSON or NDJSON file, optionally gzipped (e.g., theo_events.ndjson)")
     parser.add_argument("--output-dir", type=str, default=".", 
                        help="Output directory for CSV files (default: current directory)")
     parser.add_argument("--user", type=str, default=None,
                        help="Process only this specific user (email)")
+    parser.add_argument("--verbose", action="store_true",
+                       help="Print per-user progress while processing")
     args = parser.parse_args()
     
     if not os.path.exists(args.input):
@@ -109,7 +247,7 @@ def main():
     # Create output directory if it doesn't exist
     os.makedirs(args.output_dir, exist_ok=True)
     
-    extract_meeting_urls_from_json(args.input, args.output_dir)
+    extract_meeting_urls_from_json(args.input, args.output_dir, args.user, args.verbose)
 
 if __name__ == "__main__":
     main()
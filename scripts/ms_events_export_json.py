@@ -5,16 +5,37 @@ Exports calendar events from Microsoft Graph to JSON format
 """
 
 import os
+import io
+import gzip
 import json
 import argparse
 from datetime import datetime
 from msal import ConfidentialClientApplication
 import requests
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _dumps(obj, pretty=False):
+    """Serialize obj to UTF-8 encoded JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+    return json.dumps(obj, indent=2 if pretty else None, ensure_ascii=False).encode("utf-8")
+
+def _json_line(obj):
+    """Serialize obj as a single NDJSON line"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
 # ==============================
 # CONFIGURATION
 # ==============================
 KEYS_FILE = "keys.txt"
+EMPTY = {}  # Shared read-only default for missing nested objects
+WRITE_BUFFER_SIZE = 1 << 20  # 1MB output buffer
 
 def _load_dotenv(dotenv_path: str = ".env") -> None:
     """Minimal .env loader without external deps."""
@@ -87,55 +108,69 @@ def get_ms_graph_token():
 # ==============================
 # MICROSOFT GRAPH FUNCTIONS
 # ==============================
-def get_ms_events(token, user_email):
+# Shared session so paged requests reuse the same keep-alive connection
+_session = requests.Session()
+
+# Event fields consumed by extract_event_data
+EVENT_SELECT_FIELDS = (
+    "id", "subject", "bodyPreview", "start", "end", "onlineMeeting", "attendees",
+    "location", "isCancelled", "createdDateTime", "lastModifiedDateTime",
+)
+
+def get_ms_events(token, user_email, filter_query=None, select_fields=None):
     url = f"https://graph.microsoft.com/v1.0/users/{user_email}/calendar/events?$top=1000"
+    if filter_query:
+        url += f"&$filter={filter_query}"
+    if select_fields:
+        url += f"&$select={','.join(select_fields)}"
     headers = {"Authorization": f"Bearer {token}"}
     events = []
     while url:
-        resp = requests.get(url, headers=headers)
-        data = resp.json()
+        resp = _session.get(url, headers=headers)
+        data = orjson.loads(resp.content) if orjson is not None else resp.json()
         events.extend(data.get("value", []))
         url = data.get("@odata.nextLink")
     return events
 
-def extract_event_data(event, user_email):
+def extract_event_data(event, user_email, debug=False):
     """Extract relevant fields from Microsoft Graph event"""
+    get = event.get
     
     # Event name
-    event_name = event.get("subject", "No Title")
+    event_name = get("subject", "No Title")
     
     # Event description
-    description = event.get("bodyPreview", "")
+    description = get("bodyPreview", "")
     
     # Start and end dates
-    start_time = event.get("start", {}).get("dateTime", "")
-    end_time = event.get("end", {}).get("dateTime", "")
-    timezone = event.get("start", {}).get("timeZone", "UTC")
+    start = get("start") or EMPTY
+    start_time = start.get("dateTime", "")
+    timezone = start.get("timeZone", "UTC")
+    end_time = (get("end") or EMPTY).get("dateTime", "")
     
     # Meeting URL
-    meeting_url = ""
-    online_meeting = event.get("onlineMeeting", {})
-    if online_meeting and online_meeting.get("joinUrl"):
-        meeting_url = online_meeting["joinUrl"]
+    online_meeting = get("onlineMeeting") or EMPTY
+    meeting_url = online_meeting.get("joinUrl") or ""
     
     # Event attendees
-    attendees = []
-    for attendee in event.get("attendees", []):
-        if "emailAddress" in attendee:
-            attendees.append({
-                "email": attendee["emailAddress"]["address"],
-                "name": attendee["emailAddress"].get("name", ""),
-                "response": attendee.get("status", {}).get("response", "none")
-            })
+    attendees = [
+        {
+            "email": email_address["address"],
+            "name": email_address.get("name", ""),
+            "response": (attendee.get("status") or EMPTY).get("response", "none")
+        }
+        for attendee in get("attendees") or ()
+        if (email_address := attendee.get("emailAddress")) is not None
+    ]
     
     # Additional useful fields
-    event_id = event.get("id", "")
-    is_cancelled = event.get("isCancelled", False)
-    created_date = event.get("createdDateTime", "")
-    modified_date = event.get("lastModifiedDateTime", "")
-    location = event.get("location", {}).get("displayName", "")
+    event_id = get("id", "")
+    is_cancelled = get("isCancelled", False)
+    created_date = get("createdDateTime", "")
+    modified_date = get("lastModifiedDateTime", "")
+    location = (get("location") or EMPTY).get("displayName", "")
     
-    return {
+    event_data = {
         "user_email": user_email,
         "event_id": event_id,
         "event_name": event_name,
@@ -148,17 +183,30 @@ def extract_event_data(event, user_email):
         "location": location,
         "is_cancelled": is_cancelled,
         "created_date": created_date,
-        "modified_date": modified_date,
-        "online_meeting": online_meeting,  # Full online meeting data
-        "raw_event": event  # Full raw data for reference
+        "modified_date": modified_date
     }
+    
+    # Full Graph payloads roughly double the export size, so only keep them in debug mode
+    if debug:
+        event_data["online_meeting"] = get("onlineMeeting", {})  # Full online meeting data
+        event_data["raw_event"] = event  # Full raw data for reference
+    
+    return event_data
 
 def export_user_events(user_email, token, debug=False):
     """Export events for a single user to JSON"""
     print(f"📅 Exporting calendar for {user_email}")
     
     try:
-        ms_events = get_ms_events(token, user_email)
+        # Unless debugging, let Graph drop cancelled events and unused fields server-side
+        if debug:
+            ms_events = get_ms_events(token, user_email)
+        else:
+            ms_events = get_ms_events(
+                token, user_email,
+                filter_query="isCancelled eq false",
+                select_fields=EVENT_SELECT_FIELDS,
+            )
         print(f"   Found {len(ms_events)} events")
         
         exported_events = []
@@ -169,7 +217,7 @@ def export_user_events(user_email, token, debug=False):
             if event.get("isCancelled") and not debug:
                 continue
                 
-            event_data = extract_event_data(event, user_email)
+            event_data = extract_event_data(event, user_email, debug=debug)
             exported_events.append(event_data)
             exported_count += 1
             
@@ -194,10 +242,17 @@ def main():
                        help="Output JSON file (default: ms_events_export.json)")
     parser.add_argument("--user", type=str, required=True, 
                        help="User email to export calendar from")
-    parser.add_argument("--debug", action="store_true", help="Include cancelled events and debug info")
-    parser.add_argument("--pretty", action="store_true", help="Pretty print JSON with indentation")
+    parser.add_argument("--debug", action="store_true", help="Include cancelled events, raw Graph event data and debug info")
+    parser.add_argument("--pretty", action="store_true", help="Pretty print JSON with indentation (json format only)")
+    parser.add_argument("--format", choices=["json", "ndjson"], default="json",
+                       help="Output format: one JSON document, or NDJSON with one event per line (default: json)")
+    parser.add_argument("--gzip", action="store_true", help="Compress the output with gzip (appends .gz to the file name)")
     args = parser.parse_args()
     
+    output_path = args.output
+    if args.gzip and not output_path.endswith(".gz"):
+        output_path += ".gz"
+    
     # Get Microsoft Graph token
     print("🔐 Authenticating with Microsoft Graph...")
     token = get_ms_graph_token()
@@ -217,16 +272,24 @@ def main():
         "events": exported_events
     }
     
-    # Write to JSON file
-    with open(args.output, "w", encoding="utf-8") as f:
-        if args.pretty:
-            json.dump(output_data, f, indent=2, ensure_ascii=False)
+    # Write to output file (level 1 gzip keeps compression cheaper than encoding)
+    if args.gzip:
+        out = io.BufferedWriter(gzip.open(output_path, "wb", compresslevel=1), WRITE_BUFFER_SIZE)
+    else:
+        out = open(output_path, "wb", buffering=WRITE_BUFFER_SIZE)
+    
+    with out as f:
+        if args.format == "ndjson":
+            # Header line first, then one event per line so readers can stream
+            f.write(_json_line({"export_info": output_data["export_info"]}))
+            for event in exported_events:
+                f.write(_json_line(event))
         else:
-            json.dump(output_data, f, ensure_ascii=False)
+            f.write(_dumps(output_data, pretty=args.pretty))
     
     print(f"\n🎉 Export complete!")
     print(f"📊 Total events exported: {len(exported_events)}")
-    print(f"📁 Output file: {args.output}")
+    print(f"📁 Output file: {output_path}")
     
     # Show summary
     events_with_meetings = sum(1 for event in exported_events if event.get("meeting_url"))